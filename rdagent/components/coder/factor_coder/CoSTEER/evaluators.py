@@ -1,13 +1,20 @@
-import io
+import contextvars
+import hashlib
 import json
 import re
+import threading
 from abc import abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple
 
+import numpy as np
 import pandas as pd
-from jinja2 import Environment, StrictUndefined
+from jinja2 import Environment, StrictUndefined, Template
 
+from rdagent.components.coder.factor_coder.config import FACTOR_IMPLEMENT_SETTINGS
 from rdagent.components.coder.factor_coder.CoSTEER.evolvable_subjects import (
     FactorEvolvingItem,
 )
@@ -17,12 +24,205 @@ from rdagent.core.evaluation import Evaluator, Feedback
 from rdagent.core.evolving_framework import QueriedKnowledge
 from rdagent.core.experiment import Task, Workspace
 from rdagent.core.prompts import Prompts
-from rdagent.core.utils import multiprocessing_wrapper
+from rdagent.core.scenario import Scenario
+from rdagent.core.utils import LLM_CACHE_SEED_GEN, multiprocessing_wrapper
 from rdagent.log import rdagent_logger as logger
 from rdagent.oai.llm_conf import LLM_SETTINGS
-from rdagent.oai.llm_utils import APIBackend
+from rdagent.oai.llm_utils import APIBackend, SQliteLazyCache
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+    logger.warning("numba is not installed. The daily correlation will be calculated with pandas.")
 
 evaluate_prompts = Prompts(file_path=Path(__file__).parent.parent / "prompts.yaml")
+# The templates of the evaluators are compiled once here instead of in every evaluation.
+evaluate_templates: dict[str, Template] = {
+    key: Environment(undefined=StrictUndefined).from_string(value)
+    for key, value in evaluate_prompts.items()
+    if key.startswith("evaluator_")
+}
+
+# tokens kept free when fitting the execution feedback into the chat token limit
+TOKEN_SAFETY_MARGIN = 64
+
+
+@lru_cache(maxsize=2)
+def _build_backend(use_chat_cache: bool | None, llm_settings: str) -> APIBackend:
+    return APIBackend(use_chat_cache=use_chat_cache)
+
+
+def _get_backend(use_chat_cache: bool | None = None) -> APIBackend:
+    """
+    The backends are shared by the evaluators, so the clients and the tokenizer are built only once.
+    A backend reads `LLM_SETTINGS` when it is built, so a change of the settings builds a new one.
+    """
+    return _build_backend(use_chat_cache, LLM_SETTINGS.model_dump_json())
+
+
+def shorten_prompt(
+    tpl: str | Template,
+    render_kwargs: dict,
+    shorten_key: str | List[str],
+    max_trail: int = 10,
+    system_prompt: str | None = None,
+) -> str:
+    """When the prompt is too long. We have to shorten it.
+    But we should not truncate the prompt directly, so we should find the key we want to shorten and then shorten it.
+
+    The prompt is rendered and counted once. Only when it exceeds the chat token limit, the values of
+    `shorten_key` are tokenized (in one batch) and each of them keeps at most the same number of tokens `tau`
+    from its tail, where `tau` is the largest cap that makes the prompt fit.
+
+    Parameters
+    ----------
+    tpl : str | Template
+        the template of the user prompt
+    render_kwargs : dict
+        the values to render the template
+    shorten_key : str | List[str]
+        the keys of `render_kwargs` which can be shortened
+    max_trail : int
+        the tokens kept free in the chat token limit
+    system_prompt : str | None
+        the system prompt sent along with the user prompt
+
+    Returns
+    -------
+    str
+        the rendered user prompt
+    """
+    if isinstance(tpl, str):
+        tpl = Environment(undefined=StrictUndefined).from_string(tpl)
+    user_prompt = tpl.render(**render_kwargs)
+    # the same tokenizer as the backend, so the shortened prompt fits by the backend's own count
+    backend = _get_backend()
+    encoder = backend.encoder
+    if encoder is None:
+        return user_prompt
+
+    total_tokens = backend.build_messages_and_calculate_token(user_prompt=user_prompt, system_prompt=system_prompt)
+    if total_tokens <= LLM_SETTINGS.chat_token_limit:
+        return user_prompt
+
+    keys = [shorten_key] if isinstance(shorten_key, str) else shorten_key
+    keys = [key for key in keys if isinstance(render_kwargs.get(key), str)]
+    tokens_list = encoder.encode_batch([render_kwargs[key] for key in keys], disallowed_special=())
+    budget = LLM_SETTINGS.chat_token_limit - max_trail - (total_tokens - sum(len(tokens) for tokens in tokens_list))
+
+    # the largest cap `tau` with sum(min(len_i, tau)) <= budget
+    tau = max((len(tokens) for tokens in tokens_list), default=0)
+    remaining = max(budget, 0)
+    for i, length in enumerate(sorted(len(tokens) for tokens in tokens_list)):
+        share = remaining // (len(tokens_list) - i)
+        if length > share:
+            tau = share
+            break
+        remaining -= length
+
+    # the latest part of the values (e.g. the tail of the execution feedback) are usually the most informative ones
+    shortened_kwargs = {
+        key: encoder.decode(tokens[len(tokens) - tau :]) if tau > 0 else ""
+        for key, tokens in zip(keys, tokens_list)
+        if len(tokens) > tau
+    }
+    return tpl.render(**{**render_kwargs, **shortened_kwargs})
+
+
+# The long lists of numbers printed in the execution feedback are useless for the evaluation.
+LONG_NUMBER_LIST_PATTERN = re.compile(r"(?<=\D)(,\s+-?\d+\.\d+){50,}(?=\D)")
+WARNING_LINE_PATTERN = re.compile(r"^.*warning.*(?:\n|\Z)", re.IGNORECASE | re.MULTILINE)
+MEMORY_ADDRESS_PATTERN = re.compile(r"0x[0-9a-fA-F]+")
+
+
+def _remove_warning_lines(text: str) -> str:
+    """Same as `"\n".join(line for line in text.split("\n") if "warning" not in line.lower())` in a single pass."""
+    result = WARNING_LINE_PATTERN.sub("", text)
+    # the pattern keeps the newline in front of a removed last line, while joining the lines does not
+    if result.endswith("\n") and "warning" in text[text.rfind("\n") + 1 :].lower():
+        result = result[:-1]
+    return result
+
+
+def _normalize_execution_feedback(execution_feedback: str) -> str:
+    """Drop the parts of the execution feedback which vary between runs but do not change the critic."""
+    execution_feedback = _remove_warning_lines(LONG_NUMBER_LIST_PATTERN.sub(", ", execution_feedback))
+    lines = [line.strip() for line in execution_feedback.split("\n")]
+    return MEMORY_ADDRESS_PATTERN.sub("0x", "\n".join(line for line in lines if line))
+
+
+class PromptCache:
+    """
+    Cache the responses of the evaluators by the structure of their prompts.
+
+    The prompts of the evaluators are regular templates with a few variable slots, so the key is built from the
+    hash of each slot instead of the rendered prompt. The execution feedback should be normalized before hashing.
+    The responses are kept in an in-process LRU layer and persisted into the chat cache database.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: SQliteLazyCache | None = None
+
+    @staticmethod
+    def build_key(namespace: str, *slots: str | None) -> str:
+        return namespace + ":" + "".join(hashlib.sha256(str(slot).encode()).hexdigest() for slot in slots)
+
+    @property
+    def db(self) -> SQliteLazyCache:
+        if self._db is None:
+            self._db = SQliteLazyCache(cache_location=LLM_SETTINGS.prompt_cache_path)
+        return self._db
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        value = self.db.chat_get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._remember(key, value)
+        self.db.chat_set(key, value)
+
+    def _remember(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            if len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+
+EVALUATOR_PROMPT_CACHE = PromptCache()
+
+_SCENARIO_DESC_CACHE_SIZE = 256
+_scenario_desc_cache: OrderedDict = OrderedDict()
+_scenario_desc_lock = threading.Lock()
+
+
+def _get_scenario_desc(scen: Scenario | None, task: Task | None) -> str:
+    """`scen.get_scenario_all_desc(task)` shared by all the evaluators of the same scenario and task information."""
+    if scen is None:
+        return "No scenario description."
+    key = (id(scen), task.get_task_information() if task is not None else None)
+    with _scenario_desc_lock:
+        cached = _scenario_desc_cache.get(key)
+        # the scenario is kept in the value, so its id can not be reused by another object
+        if cached is not None and cached[0] is scen:
+            _scenario_desc_cache.move_to_end(key)
+            return cached[1]
+    desc = scen.get_scenario_all_desc(task)
+    with _scenario_desc_lock:
+        _scenario_desc_cache[key] = (scen, desc)
+        if len(_scenario_desc_cache) > _SCENARIO_DESC_CACHE_SIZE:
+            _scenario_desc_cache.popitem(last=False)
+    return desc
 
 
 class FactorEvaluator(Evaluator):
@@ -53,27 +253,55 @@ class FactorEvaluator(Evaluator):
         """
         raise NotImplementedError("Please implement the `evaluator` method")
 
-    def _get_df(self, gt_implementation: Workspace, implementation: Workspace):
-        if gt_implementation is not None:
+    def _get_df(
+        self,
+        gt_implementation: Workspace,
+        implementation: Workspace,
+        gt_df: pd.DataFrame | None = None,
+        gen_df: pd.DataFrame | None = None,
+    ):
+        """
+        `gt_df` and `gen_df` can be passed in if the caller has already executed the workspaces.
+        Then the workspaces will not be executed again.
+        """
+        if gt_df is None and gt_implementation is not None:
             _, gt_df = gt_implementation.execute()
-            if isinstance(gt_df, pd.Series):
-                gt_df = gt_df.to_frame("gt_factor")
-            if isinstance(gt_df, pd.DataFrame):
-                gt_df = gt_df.sort_index()
-        else:
-            gt_df = None
-
-        _, gen_df = implementation.execute()
-        if isinstance(gen_df, pd.Series):
-            gen_df = gen_df.to_frame("source_factor")
-        if isinstance(gen_df, pd.DataFrame):
-            gen_df = gen_df.sort_index()
-        return gt_df, gen_df
+        if gen_df is None:
+            _, gen_df = implementation.execute()
+        return self._format_df(gt_df, "gt_factor"), self._format_df(gen_df, "source_factor")
+
+    @staticmethod
+    def _format_df(df: pd.Series | pd.DataFrame | None, series_name: str) -> pd.DataFrame | None:
+        if isinstance(df, pd.Series):
+            df = df.to_frame(series_name)
+        if isinstance(df, pd.DataFrame) and not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        if isinstance(df, pd.DataFrame) and FACTOR_IMPLEMENT_SETTINGS.evaluator_float32_values:
+            float64_columns = [column for column, dtype in df.dtypes.items() if dtype == np.float64]
+            if float64_columns:
+                df = df.astype({column: np.float32 for column in float64_columns})
+        return df
 
     def __str__(self) -> str:
         return self.__class__.__name__
 
 
+def _value_dtype() -> type:
+    return np.float32 if FACTOR_IMPLEMENT_SETTINGS.evaluator_float32_values else np.float64
+
+
+def _numeric_values(df: pd.DataFrame) -> np.ndarray | None:
+    """The values of `df` as a float array (missing values become NaN), or None if any column is not numeric."""
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        return None
+    return df.to_numpy(dtype=_value_dtype(), na_value=np.nan)
+
+
+def _count_missing(df: pd.DataFrame) -> int:
+    values = _numeric_values(df)
+    return int(np.isnan(values).sum()) if values is not None else int(df.isna().sum().sum())
+
+
 class FactorCodeEvaluator(FactorEvaluator):
     def evaluate(
         self,
@@ -87,49 +315,48 @@ class FactorCodeEvaluator(FactorEvaluator):
         factor_information = target_task.get_task_information()
         code = implementation.code
 
-        system_prompt = (
-            Environment(undefined=StrictUndefined)
-            .from_string(evaluate_prompts["evaluator_code_feedback_v1_system"])
-            .render(
-                scenario=(
-                    self.scen.get_scenario_all_desc(target_task)
-                    if self.scen is not None
-                    else "No scenario description."
-                )
-            )
+        system_prompt = evaluate_templates["evaluator_code_feedback_v1_system"].render(
+            scenario=_get_scenario_desc(self.scen, target_task)
         )
 
-        execution_feedback_to_render = execution_feedback
-        for _ in range(10):  # 10 times to split the content is enough
-            user_prompt = (
-                Environment(undefined=StrictUndefined)
-                .from_string(
-                    evaluate_prompts["evaluator_code_feedback_v1_user"],
-                )
-                .render(
-                    factor_information=factor_information,
-                    code=code,
-                    execution_feedback=execution_feedback_to_render,
-                    factor_value_feedback=factor_value_feedback,
-                    gt_code=gt_implementation.code if gt_implementation else None,
-                )
+        gt_code = gt_implementation.code if gt_implementation else None
+
+        cache_key = None
+        if FACTOR_IMPLEMENT_SETTINGS.evaluator_use_cache:
+            cache_key = PromptCache.build_key(
+                "evaluator_code_feedback_v1",
+                system_prompt,
+                factor_information,
+                code,
+                _normalize_execution_feedback(execution_feedback),
+                factor_value_feedback,
+                gt_code,
             )
-            if (
-                APIBackend().build_messages_and_calculate_token(
-                    user_prompt=user_prompt,
-                    system_prompt=system_prompt,
-                )
-                > LLM_SETTINGS.chat_token_limit
-            ):
-                execution_feedback_to_render = execution_feedback_to_render[len(execution_feedback_to_render) // 2 :]
-            else:
-                break
-        critic_response = APIBackend().build_messages_and_create_chat_completion(
+            critic_response = EVALUATOR_PROMPT_CACHE.get(cache_key)
+            if critic_response is not None:
+                return critic_response, None
+
+        user_prompt = shorten_prompt(
+            evaluate_templates["evaluator_code_feedback_v1_user"],
+            {
+                "factor_information": factor_information,
+                "code": code,
+                "execution_feedback": execution_feedback,
+                "factor_value_feedback": factor_value_feedback,
+                "gt_code": gt_code,
+            },
+            "execution_feedback",
+            max_trail=TOKEN_SAFETY_MARGIN,
+            system_prompt=system_prompt,
+        )
+        critic_response = _get_backend().build_messages_and_create_chat_completion(
             user_prompt=user_prompt,
             system_prompt=system_prompt,
             json_mode=False,
         )
 
+        if cache_key is not None:
+            EVALUATOR_PROMPT_CACHE.set(cache_key, critic_response)
         return critic_response, None
 
 
@@ -138,14 +365,22 @@ class FactorInfEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        _, gen_df = self._get_df(gt_implementation, implementation)
+        _, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        INF_count = gen_df.isin([float("inf"), -float("inf")]).sum().sum()
+        values = _numeric_values(gen_df)
+        if values is not None:
+            infinite_values = np.isinf(values)
+            # count the infinite values only for the message of a broken factor
+            INF_count = int(infinite_values.sum()) if infinite_values.any() else 0
+        else:
+            INF_count = gen_df.isin([float("inf"), -float("inf")]).sum().sum()
         if INF_count == 0:
             return "The source dataframe does not have any infinite values.", True
         else:
@@ -160,8 +395,10 @@ class FactorSingleColumnEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        _, gen_df = self._get_df(gt_implementation, implementation)
+        _, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
@@ -177,32 +414,34 @@ class FactorSingleColumnEvaluator(FactorEvaluator):
 
 
 class FactorOutputFormatEvaluator(FactorEvaluator):
+    @staticmethod
+    def _schema_str(df: pd.DataFrame) -> str:
+        """The schema of the dataframe without the per column null counting of `DataFrame.info`"""
+        columns_str = "\n".join(f"  {column}: {dtype}" for column, dtype in df.dtypes.items())
+        return (
+            f"{type(df)}\n"
+            f"shape={df.shape}\n"
+            f"index_names={list(df.index.names)}\n"
+            f"index_dtypes={[str(level.dtype) for level in getattr(df.index, 'levels', [df.index])]}\n"
+            f"columns=\n{columns_str}\n"
+        )
+
     def evaluate(
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Skip the evaluation of the output format.",
                 False,
             )
-        buffer = io.StringIO()
-        gen_df.info(buf=buffer)
-        gen_df_info_str = f"The use is currently working on a feature related task.\nThe output dataframe info is:\n{buffer.getvalue()}"
-        system_prompt = (
-            Environment(undefined=StrictUndefined)
-            .from_string(
-                evaluate_prompts["evaluator_output_format_system"],
-            )
-            .render(
-                scenario=(
-                    self.scen.get_scenario_all_desc(implementation.target_task)
-                    if self.scen is not None
-                    else "No scenario description."
-                )
-            )
+        gen_df_info_str = f"The use is currently working on a feature related task.\nThe output dataframe info is:\n{self._schema_str(gen_df)}"
+        system_prompt = evaluate_templates["evaluator_output_format_system"].render(
+            scenario=_get_scenario_desc(self.scen, implementation.target_task)
         )
 
         # TODO: with retry_context(retry_n=3, except_list=[KeyError]):
@@ -212,7 +451,7 @@ class FactorOutputFormatEvaluator(FactorEvaluator):
 
         while attempts < max_attempts:
             try:
-                api = APIBackend() if attempts == 0 else APIBackend(use_chat_cache=False)
+                api = _get_backend() if attempts == 0 else _get_backend(use_chat_cache=False)
                 resp = api.build_messages_and_create_chat_completion(
                     user_prompt=gen_df_info_str, system_prompt=system_prompt, json_mode=True
                 )
@@ -242,8 +481,10 @@ class FactorDatetimeDailyEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str | object]:
-        _, gen_df = self._get_df(gt_implementation, implementation)
+        _, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return "The source dataframe is None. Skip the evaluation of the datetime format.", False
 
@@ -251,15 +492,15 @@ class FactorDatetimeDailyEvaluator(FactorEvaluator):
             return "The source dataframe does not have a datetime index. Please check the implementation.", False
 
         try:
-            pd.to_datetime(gen_df.index.get_level_values("datetime"))
+            datetime_index = pd.to_datetime(gen_df.index.get_level_values("datetime"))
         except Exception:
             return (
                 f"The source dataframe has a datetime index but it is not in the correct format (maybe a regular string or other objects). Please check the implementation.\n The head of the output dataframe is: \n{gen_df.head()}",
                 False,
             )
 
-        time_diff = pd.to_datetime(gen_df.index.get_level_values("datetime")).to_series().diff().dropna().unique()
-        if pd.Timedelta(minutes=1) in time_diff:
+        # NaT gaps never compare equal, just like the dropped NaT of `Series.diff`
+        if (np.diff(datetime_index.values) == np.timedelta64(1, "m")).any():
             return (
                 "The generated dataframe is not daily. The implementation is definitely wrong. Please check the implementation.",
                 False,
@@ -272,8 +513,10 @@ class FactorRowCountEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
@@ -296,15 +539,18 @@ class FactorIndexEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        gen_index_set, gt_index_set = set(gen_df.index), set(gt_df.index)
-        similarity = len(gen_index_set.intersection(gt_index_set)) / len(gen_index_set.union(gt_index_set))
+        # pandas' hash based set operations avoid materializing every index entry as a Python object
+        gen_index, gt_index = gen_df.index.unique(), gt_df.index.unique()
+        similarity = len(gen_index.intersection(gt_index)) / len(gen_index.union(gt_index))
         return (
             (
                 f"The source dataframe and the ground truth dataframe have different index with a similarity of {similarity:.2%}. The similarity is calculated by the number of shared indices divided by the union indices. "
@@ -321,18 +567,21 @@ class FactorMissingValuesEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 False,
             )
-        if gen_df.isna().sum().sum() == gt_df.isna().sum().sum():
+        gen_missing_count, gt_missing_count = _count_missing(gen_df), _count_missing(gt_df)
+        if gen_missing_count == gt_missing_count:
             return "Both dataframes have the same missing values.", True
         else:
             return (
-                f"The dataframes do not have the same missing values. The source dataframe has {gen_df.isna().sum().sum()} missing values, while the ground truth dataframe has {gt_df.isna().sum().sum()} missing values. Please check the implementation.",
+                f"The dataframes do not have the same missing values. The source dataframe has {gen_missing_count} missing values, while the ground truth dataframe has {gt_missing_count} missing values. Please check the implementation.",
                 False,
             )
 
@@ -342,21 +591,34 @@ class FactorEqualValueRatioEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
                 -1,
             )
         try:
-            close_values = gen_df.sub(gt_df).abs().lt(1e-6)
-            result_int = close_values.astype(int)
-            pos_num = result_int.sum().sum()
+            # align like `gen_df.sub(gt_df)` does and compare the raw values in one pass
+            gen_df, gt_df = gen_df.align(gt_df)
+            with np.errstate(invalid="ignore"):
+                close_values = (
+                    np.abs(
+                        gen_df.to_numpy(dtype=_value_dtype(), na_value=np.nan)
+                        - gt_df.to_numpy(dtype=_value_dtype(), na_value=np.nan)
+                    )
+                    < 1e-6
+                )
+            pos_num = int(close_values.sum())
             acc_rate = pos_num / close_values.size
-        except:
-            close_values = gen_df
-        if close_values.all().iloc[0]:
+        except Exception:
+            return (
+                "The values of the source dataframe can not be compared with the ground truth dataframe. Please check the implementation.",
+                0,
+            )
+        if close_values[:, 0].all():
             return (
                 "All values in the dataframes are equal within the tolerance of 1e-6.",
                 acc_rate,
@@ -368,6 +630,75 @@ class FactorEqualValueRatioEvaluator(FactorEvaluator):
             )
 
 
+if njit is not None:
+
+    @njit(cache=True)
+    def _average_rank(values: np.ndarray) -> np.ndarray:
+        """The same ranks as `Series.rank()`, ties get the average of their ranks."""
+        order = np.argsort(values, kind="mergesort")
+        ranks = np.empty(values.shape[0])
+        i = 0
+        while i < values.shape[0]:
+            j = i
+            while j + 1 < values.shape[0] and values[order[j + 1]] == values[order[i]]:
+                j += 1
+            for k in range(i, j + 1):
+                ranks[order[k]] = (i + j) / 2 + 1
+            i = j + 1
+        return ranks
+
+    # not `parallel=True`: the factors are already evaluated in threads, and the threading layer of numba does not
+    # support launches from concurrent (and exiting) threads. Releasing the GIL lets the threads run the kernel at once.
+    @njit(cache=True, nogil=True)
+    def _grouped_corr(source: np.ndarray, gt: np.ndarray, starts: np.ndarray, rank: bool) -> np.ndarray:
+        """The pearson correlation of `source` and `gt` on each run `starts[i]:starts[i + 1]`."""
+        n_groups = starts.shape[0] - 1
+        out = np.empty(n_groups)
+        for g in range(n_groups):
+            x = source[starts[g] : starts[g + 1]]
+            y = gt[starts[g] : starts[g + 1]]
+            if rank:
+                x = _average_rank(x)
+                y = _average_rank(y)
+            x = x - x.mean()
+            y = y - y.mean()
+            std = np.sqrt((x * x).sum() * (y * y).sum())
+            out[g] = (x * y).sum() / std if std != 0 else np.nan
+        return out
+
+
+def _daily_corr(concat_df: pd.DataFrame, method: str = "pearson") -> pd.Series:
+    """
+    The correlation between column `source` and `gt` on each datetime.
+
+    It equals `concat_df.groupby("datetime").apply(lambda df: df["source"].corr(df["gt"], method=method))`
+    but is calculated with vectorized group reductions instead of a Python callback per datetime.
+    The reductions run in a compiled kernel, which releases the GIL, if numba is installed.
+    """
+    # pairwise complete observations, which is what `Series.corr` uses
+    df = concat_df[["source", "gt"]].dropna()
+    if njit is not None:
+        codes, datetimes = pd.factorize(df.index.get_level_values("datetime"), sort=True)
+        valid = codes >= 0
+        order = np.argsort(codes[valid], kind="stable")
+        starts = np.searchsorted(codes[valid][order], np.arange(len(datetimes) + 1))
+        corr = _grouped_corr(
+            np.ascontiguousarray(df["source"].to_numpy(dtype=np.float64)[valid][order]),
+            np.ascontiguousarray(df["gt"].to_numpy(dtype=np.float64)[valid][order]),
+            starts,
+            method == "spearman",
+        )
+        return pd.Series(corr, index=pd.Index(datetimes, name="datetime"))
+    if method == "spearman":
+        df = df.groupby(level="datetime").rank()
+    datetime = df.index.get_level_values("datetime")
+    demeaned = df - df.groupby(datetime).transform("mean")
+    source, gt = demeaned["source"], demeaned["gt"]
+    cov = (source * gt).groupby(datetime).sum()
+    std = np.sqrt((source**2).groupby(datetime).sum() * (gt**2).groupby(datetime).sum())
+    return cov / std.where(std != 0)
+
+
 class FactorCorrelationEvaluator(FactorEvaluator):
     def __init__(self, hard_check: bool, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -377,8 +708,10 @@ class FactorCorrelationEvaluator(FactorEvaluator):
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
+        gen_df: pd.DataFrame | None = None,
+        gt_df: pd.DataFrame | None = None,
     ) -> Tuple[str, object]:
-        gt_df, gen_df = self._get_df(gt_implementation, implementation)
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gt_df=gt_df, gen_df=gen_df)
         if gen_df is None:
             return (
                 "The source dataframe is None. Please check the implementation.",
@@ -386,13 +719,8 @@ class FactorCorrelationEvaluator(FactorEvaluator):
             )
         concat_df = pd.concat([gen_df, gt_df], axis=1)
         concat_df.columns = ["source", "gt"]
-        ic = concat_df.groupby("datetime").apply(lambda df: df["source"].corr(df["gt"])).dropna().mean()
-        ric = (
-            concat_df.groupby("datetime")
-            .apply(lambda df: df["source"].corr(df["gt"], method="spearman"))
-            .dropna()
-            .mean()
-        )
+        ic = _daily_corr(concat_df).dropna().mean()
+        ric = _daily_corr(concat_df, method="spearman").dropna().mean()
 
         if self.hard_check:
             if ic > 0.99 and ric > 0.99:
@@ -410,11 +738,19 @@ class FactorCorrelationEvaluator(FactorEvaluator):
 
 
 class FactorValueEvaluator(FactorEvaluator):
+    def _evaluate_output_format(
+        self, seed: int, implementation: Workspace, gt_implementation: Workspace, **df_kwargs
+    ) -> Tuple[str, object]:
+        """Run `FactorOutputFormatEvaluator` in a worker thread, with the chat cache seeds generated from `seed`"""
+        with LLM_CACHE_SEED_GEN.thread_seed(seed):
+            return FactorOutputFormatEvaluator(self.scen).evaluate(implementation, gt_implementation, **df_kwargs)
+
     def evaluate(
         self,
         implementation: Workspace,
         gt_implementation: Workspace,
         version: int = 1,  # 1 for qlib factors and 2 for kaggle factors
+        gen_df: pd.DataFrame | None = None,
         **kwargs,
     ) -> Tuple:
         conclusions = []
@@ -427,58 +763,95 @@ class FactorValueEvaluator(FactorEvaluator):
         high_correlation_result = False
         row_result = None
 
-        # Check if both dataframe has only one columns Mute this since factor task might generate more than one columns now
-        if version == 1:
-            feedback_str, _ = FactorSingleColumnEvaluator(self.scen).evaluate(implementation, gt_implementation)
-            conclusions.append(feedback_str)
-        elif version == 2:
-            input_shape = self.scen.input_shape
-            _, gen_df = self._get_df(gt_implementation, implementation)
-            if gen_df.shape[-1] > input_shape[-1]:
-                conclusions.append(
-                    "Output dataframe has more columns than input feature which is not acceptable in feature processing tasks. Please check the implementation to avoid generating too many columns. Consider this implementation as a failure."
-                )
-
-        feedback_str, inf_evaluate_res = FactorInfEvaluator(self.scen).evaluate(implementation, gt_implementation)
-        conclusions.append(feedback_str)
+        # Execute the workspaces only once and share the dataframes with all the sub evaluators
+        gt_df, gen_df = self._get_df(gt_implementation, implementation, gen_df=gen_df)
+        if gen_df is None:
+            # All the checks below would fail on a missing dataframe, so skip them instead of re-executing the code
+            return (
+                "The source dataframe is None. Skip the evaluation of the factor value. Please check the implementation.",
+                False,
+            )
+        df_kwargs = {"gt_df": gt_df, "gen_df": gen_df}
+
+        # Like in `multiprocessing_wrapper`, the seed is drawn here and the worker runs in a copy of the context
+        # (e.g. with the log tag), so its chat cache seeds do not depend on how the threads are scheduled.
+        seed = LLM_CACHE_SEED_GEN.get_next_seed()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # The output format check is bound to a LLM call, so it runs aside the dataframe based checks below.
+            output_format_future = executor.submit(
+                contextvars.copy_context().run,
+                self._evaluate_output_format,
+                seed,
+                implementation,
+                gt_implementation,
+                **df_kwargs,
+            )
 
-        # Check if the index of the dataframe is ("datetime", "instrument")
-        feedback_str, _ = FactorOutputFormatEvaluator(self.scen).evaluate(implementation, gt_implementation)
-        conclusions.append(feedback_str)
-        if version == 1:
-            feedback_str, daily_check_result = FactorDatetimeDailyEvaluator(self.scen).evaluate(
-                implementation, gt_implementation
+            # Check if both dataframe has only one columns Mute this since factor task might generate more than one columns now
+            if version == 1:
+                feedback_str, _ = FactorSingleColumnEvaluator(self.scen).evaluate(
+                    implementation, gt_implementation, **df_kwargs
+                )
+                conclusions.append(feedback_str)
+            elif version == 2:
+                input_shape = self.scen.input_shape
+                if gen_df.shape[-1] > input_shape[-1]:
+                    conclusions.append(
+                        "Output dataframe has more columns than input feature which is not acceptable in feature processing tasks. Please check the implementation to avoid generating too many columns. Consider this implementation as a failure."
+                    )
+
+            feedback_str, inf_evaluate_res = FactorInfEvaluator(self.scen).evaluate(
+                implementation, gt_implementation, **df_kwargs
             )
             conclusions.append(feedback_str)
-        else:
-            daily_check_result = None
 
-        # Check dataframe format
-        if gt_implementation is not None:
-            feedback_str, row_result = FactorRowCountEvaluator(self.scen).evaluate(implementation, gt_implementation)
-            conclusions.append(feedback_str)
+            if version == 1:
+                daily_feedback_str, daily_check_result = FactorDatetimeDailyEvaluator(self.scen).evaluate(
+                    implementation, gt_implementation, **df_kwargs
+                )
+            else:
+                daily_check_result = None
 
-            feedback_str, index_result = FactorIndexEvaluator(self.scen).evaluate(implementation, gt_implementation)
-            conclusions.append(feedback_str)
+            # Check dataframe format
+            gt_conclusions = []
+            if gt_implementation is not None:
+                feedback_str, row_result = FactorRowCountEvaluator(self.scen).evaluate(
+                    implementation, gt_implementation, **df_kwargs
+                )
+                gt_conclusions.append(feedback_str)
 
-            feedback_str, output_format_result = FactorMissingValuesEvaluator(self.scen).evaluate(
-                implementation, gt_implementation
-            )
-            conclusions.append(feedback_str)
+                feedback_str, index_result = FactorIndexEvaluator(self.scen).evaluate(
+                    implementation, gt_implementation, **df_kwargs
+                )
+                gt_conclusions.append(feedback_str)
 
-            feedback_str, equal_value_ratio_result = FactorEqualValueRatioEvaluator(self.scen).evaluate(
-                implementation, gt_implementation
-            )
-            conclusions.append(feedback_str)
+                feedback_str, output_format_result = FactorMissingValuesEvaluator(self.scen).evaluate(
+                    implementation, gt_implementation, **df_kwargs
+                )
+                gt_conclusions.append(feedback_str)
 
-            if index_result > 0.99:
-                feedback_str, high_correlation_result = FactorCorrelationEvaluator(
-                    hard_check=True, scen=self.scen
-                ).evaluate(implementation, gt_implementation)
-            else:
-                high_correlation_result = False
-                feedback_str = "The source dataframe and the ground truth dataframe have different index. Give up comparing the values and correlation because it's useless"
-            conclusions.append(feedback_str)
+                feedback_str, equal_value_ratio_result = FactorEqualValueRatioEvaluator(self.scen).evaluate(
+                    implementation, gt_implementation, **df_kwargs
+                )
+                gt_conclusions.append(feedback_str)
+
+                if index_result > 0.99:
+                    feedback_str, high_correlation_result = FactorCorrelationEvaluator(
+                        hard_check=True, scen=self.scen
+                    ).evaluate(implementation, gt_implementation, **df_kwargs)
+                else:
+                    high_correlation_result = False
+                    feedback_str = "The source dataframe and the ground truth dataframe have different index. Give up comparing the values and correlation because it's useless"
+                gt_conclusions.append(feedback_str)
+
+            # Check if the index of the dataframe is ("datetime", "instrument")
+            output_format_feedback_str, _ = output_format_future.result()
+
+        # Keep the conclusions in the same order as the checks are listed
+        conclusions.append(output_format_feedback_str)
+        if version == 1:
+            conclusions.append(daily_feedback_str)
+        conclusions.extend(gt_conclusions)
 
         # Combine all conclusions into a single string
         conclusion_str = "\n".join(conclusions)
@@ -507,46 +880,43 @@ class FactorFinalDecisionEvaluator(Evaluator):
         code_feedback: str,
         **kwargs,
     ) -> Tuple:
-        system_prompt = (
-            Environment(undefined=StrictUndefined)
-            .from_string(evaluate_prompts["evaluator_final_decision_v1_system"])
-            .render(
-                scenario=(
-                    self.scen.get_scenario_all_desc(target_task)
-                    if self.scen is not None
-                    else "No scenario description."
-                )
-            )
+        system_prompt = evaluate_templates["evaluator_final_decision_v1_system"].render(
+            scenario=_get_scenario_desc(self.scen, target_task)
+        )
+        factor_information = target_task.get_task_information()
+        factor_value_feedback = (
+            value_feedback
+            if value_feedback is not None
+            else "No Ground Truth Value provided, so no evaluation on value is performed."
         )
-        execution_feedback_to_render = execution_feedback
 
-        for _ in range(10):  # 10 times to split the content is enough
-            user_prompt = (
-                Environment(undefined=StrictUndefined)
-                .from_string(
-                    evaluate_prompts["evaluator_final_decision_v1_user"],
-                )
-                .render(
-                    factor_information=target_task.get_task_information(),
-                    execution_feedback=execution_feedback_to_render,
-                    code_feedback=code_feedback,
-                    factor_value_feedback=(
-                        value_feedback
-                        if value_feedback is not None
-                        else "No Ground Truth Value provided, so no evaluation on value is performed."
-                    ),
-                )
+        cache_key = None
+        if FACTOR_IMPLEMENT_SETTINGS.evaluator_use_cache:
+            cache_key = PromptCache.build_key(
+                "evaluator_final_decision_v1",
+                system_prompt,
+                factor_information,
+                _normalize_execution_feedback(execution_feedback),
+                code_feedback,
+                factor_value_feedback,
             )
-            if (
-                APIBackend().build_messages_and_calculate_token(
-                    user_prompt=user_prompt,
-                    system_prompt=system_prompt,
-                )
-                > LLM_SETTINGS.chat_token_limit
-            ):
-                execution_feedback_to_render = execution_feedback_to_render[len(execution_feedback_to_render) // 2 :]
-            else:
-                break
+            cached_response = EVALUATOR_PROMPT_CACHE.get(cache_key)
+            if cached_response is not None:
+                final_evaluation_dict = json.loads(cached_response)
+                return final_evaluation_dict["final_decision"], final_evaluation_dict["final_feedback"]
+
+        user_prompt = shorten_prompt(
+            evaluate_templates["evaluator_final_decision_v1_user"],
+            {
+                "factor_information": factor_information,
+                "execution_feedback": execution_feedback,
+                "code_feedback": code_feedback,
+                "factor_value_feedback": factor_value_feedback,
+            },
+            "execution_feedback",
+            max_trail=TOKEN_SAFETY_MARGIN,
+            system_prompt=system_prompt,
+        )
 
         # TODO:  with retry_context(retry_n=3, except_list=[KeyError]):
         final_evaluation_dict = None
@@ -555,7 +925,7 @@ class FactorFinalDecisionEvaluator(Evaluator):
 
         while attempts < max_attempts:
             try:
-                api = APIBackend() if attempts == 0 else APIBackend(use_chat_cache=False)
+                api = _get_backend() if attempts == 0 else _get_backend(use_chat_cache=False)
                 final_evaluation_dict = json.loads(
                     api.build_messages_and_create_chat_completion(
                         user_prompt=user_prompt,
@@ -568,6 +938,10 @@ class FactorFinalDecisionEvaluator(Evaluator):
                 final_feedback = final_evaluation_dict["final_feedback"]
 
                 final_decision = str(final_decision).lower() in ["true", "1"]
+                if cache_key is not None:
+                    EVALUATOR_PROMPT_CACHE.set(
+                        cache_key, json.dumps({"final_decision": final_decision, "final_feedback": final_feedback})
+                    )
                 return final_decision, final_feedback
 
             except json.JSONDecodeError as e:
@@ -671,9 +1045,8 @@ class FactorEvaluatorForCoder(FactorEvaluator):
                 gen_df,
             ) = implementation.execute()
 
-            execution_feedback = re.sub(r"(?<=\D)(,\s+-?\d+\.\d+){50,}(?=\D)", ", ", execution_feedback)
-            factor_feedback.execution_feedback = "\n".join(
-                [line for line in execution_feedback.split("\n") if "warning" not in line.lower()]
+            factor_feedback.execution_feedback = _remove_warning_lines(
+                LONG_NUMBER_LIST_PATTERN.sub(", ", execution_feedback)
             )
 
             # 2. Get factor value feedback
@@ -687,7 +1060,10 @@ class FactorEvaluatorForCoder(FactorEvaluator):
                     factor_feedback.factor_value_feedback,
                     decision_from_value_check,
                 ) = self.value_evaluator.evaluate(
-                    implementation=implementation, gt_implementation=gt_implementation, version=target_task.version
+                    implementation=implementation,
+                    gt_implementation=gt_implementation,
+                    version=target_task.version,
+                    gen_df=gen_df,
                 )
 
             factor_feedback.final_decision_based_on_gt = gt_implementation is not None
@@ -732,46 +1108,38 @@ class FactorMultiEvaluator(Evaluator):
         super().__init__(*args, **kwargs)
         self.single_factor_implementation_evaluator = single_evaluator
 
+    def _evaluate_one(
+        self, evo: FactorEvolvingItem, index: int, queried_knowledge: QueriedKnowledge = None
+    ) -> FactorSingleFeedback:
+        return self.single_factor_implementation_evaluator.evaluate(
+            evo.sub_tasks[index],
+            evo.sub_workspace_list[index],
+            evo.sub_gt_implementations[index] if evo.sub_gt_implementations is not None else None,
+            queried_knowledge,
+        )
+
     def evaluate(
         self,
         evo: FactorEvolvingItem,
         queried_knowledge: QueriedKnowledge = None,
         **kwargs,
     ) -> FactorMultiFeedback:
+        # Evaluating a factor is dominated by waiting for the execution and the LLM calls, so threads are enough.
+        # The workers share `evo` and `queried_knowledge` and only get the index of their sub task.
         multi_implementation_feedback = multiprocessing_wrapper(
-            [
-                (
-                    self.single_factor_implementation_evaluator.evaluate,
-                    (
-                        evo.sub_tasks[index],
-                        evo.sub_workspace_list[index],
-                        evo.sub_gt_implementations[index] if evo.sub_gt_implementations is not None else None,
-                        queried_knowledge,
-                    ),
-                )
-                for index in range(len(evo.sub_tasks))
-            ],
+            [(self._evaluate_one, (evo, index, queried_knowledge)) for index in range(len(evo.sub_tasks))],
             n=RD_AGENT_SETTINGS.multi_proc_n,
+            io_bound=True,
         )
 
-        final_decision = [
-            None if single_feedback is None else single_feedback.final_decision
-            for single_feedback in multi_implementation_feedback
-        ]
-        logger.info(f"Final decisions: {final_decision} True count: {final_decision.count(True)}")
-
-        for index in range(len(evo.sub_tasks)):
-            if final_decision[index]:
+        final_decision = []
+        true_count = 0
+        for index, single_feedback in enumerate(multi_implementation_feedback):
+            decision = None if single_feedback is None else single_feedback.final_decision
+            final_decision.append(decision)
+            if decision:
+                true_count += 1
                 evo.sub_tasks[index].factor_implementation = True
+        logger.info(f"Final decisions: {final_decision} True count: {true_count}")
 
         return multi_implementation_feedback
-
-
-# TODO:
-def shorten_prompt(tpl: str, render_kwargs: dict, shorten_key: str, max_trail: int = 10) -> str:
-    """When the prompt is too long. We have to shorten it.
-    But we should not truncate the prompt directly, so we should find the key we want to shorten and then shorten it.
-    """
-    # TODO: this should replace most of code in
-    # - FactorFinalDecisionEvaluator.evaluate
-    # - FactorCodeEvaluator.evaluate
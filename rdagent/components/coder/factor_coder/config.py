@@ -14,6 +14,12 @@ class FactorImplementSettings(BaseSettings):
     coder_use_cache: bool = False
     """Indicates whether to use cache for the coder"""
 
+    evaluator_use_cache: bool = False
+    """Indicates whether to reuse the critics of the code and final decision evaluators for structurally identical prompts"""
+
+    evaluator_float32_values: bool = False
+    """Indicates whether to downcast the float64 factor values to float32 before the value checks of the evaluators"""
+
     data_folder: str = "git_ignore_folder/factor_implementation_source_data"
     """Path to the folder containing financial data (default is fundamental data in Qlib)"""
 
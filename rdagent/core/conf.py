@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 # TODO: use pydantic for other modules in Qlib
 # from pydantic_settings import BaseSettings
 
 
+def _cwd_base() -> Path:
+    """The base folder of the default paths: `RDAGENT_ROOT` if it is set, otherwise the current working directory"""
+    return Path(os.environ.get("RDAGENT_ROOT") or Path.cwd())
+
+
 class RDAgentSettings(BaseSettings):
     # TODO: (xiao) I think LLMSetting may be a better name.
     # TODO: (xiao) I think most of the config should be in oai.config
@@ -24,15 +31,15 @@ class RDAgentSettings(BaseSettings):
     max_kmeans_group_number: int = 40
 
     # workspace conf
-    workspace_path: Path = Path.cwd() / "git_ignore_folder" / "RD-Agent_workspace"
+    workspace_path: Path = Field(default_factory=lambda: _cwd_base() / "git_ignore_folder" / "RD-Agent_workspace")
 
     # multi processing conf
     multi_proc_n: int = 1
 
     # pickle cache conf
     cache_with_pickle: bool = True  # whether to use pickle cache
-    pickle_cache_folder_path_str: str = str(
-        Path.cwd() / "pickle_cache/",
+    pickle_cache_folder_path_str: str = Field(
+        default_factory=lambda: str(_cwd_base() / "pickle_cache/"),
     )  # the path of the folder to store the pickle cache
     use_file_lock: bool = (
         True  # when calling the function with same parameters, whether to use file lock to avoid
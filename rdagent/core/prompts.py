@@ -7,6 +7,9 @@ from rdagent.core.utils import SingletonBaseClass
 
 class Prompts(SingletonBaseClass, dict[str, str]):
     def __init__(self, file_path: Path) -> None:
+        # The singleton is shared by the same `file_path`, so the file is only loaded at the first construction
+        if getattr(self, "_file_path", None) == file_path:
+            return
         super().__init__()
         with file_path.open(encoding="utf8") as file:
             prompt_yaml_dict = yaml.safe_load(file)
@@ -17,3 +20,4 @@ class Prompts(SingletonBaseClass, dict[str, str]):
 
         for key, value in prompt_yaml_dict.items():
             self[key] = value
+        self._file_path = file_path
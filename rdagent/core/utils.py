@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import contextvars
 import functools
 import importlib
 import json
-import multiprocessing as mp
 import pickle
 import random
-from collections.abc import Callable
+import sys
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, ClassVar, NoReturn, cast
 
@@ -99,14 +103,28 @@ class CacheSeedGen:
     """
 
     def __init__(self) -> None:
+        self._local = threading.local()
         self.set_seed(LLM_SETTINGS.init_chat_cache_seed)
 
+    def _generator(self) -> Any:
+        # the threads started by `multiprocessing_wrapper` have their own generator; the others share `random`
+        return getattr(self._local, "generator", random)
+
     def set_seed(self, seed: int) -> None:
-        random.seed(seed)
+        self._generator().seed(seed)
 
     def get_next_seed(self) -> int:
         """generate next random int"""
-        return random.randint(0, 10000)  # noqa: S311
+        return self._generator().randint(0, 10000)
+
+    @contextmanager
+    def thread_seed(self, seed: int) -> Iterator[None]:
+        """Generate the seeds of the current thread from `seed`, without sharing a random state with other threads"""
+        self._local.generator = random.Random(seed)  # noqa: S311
+        try:
+            yield
+        finally:
+            del self._local.generator
 
 
 LLM_CACHE_SEED_GEN = CacheSeedGen()
@@ -121,10 +139,24 @@ def _subprocess_wrapper(f: Callable, seed: int, args: list) -> Any:
     return f(*args)
 
 
-def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) -> list:
+def _thread_wrapper(f: Callable, seed: int, args: list, context: contextvars.Context) -> Any:
+    """
+    The thread version of `_subprocess_wrapper`. The seed only applies to the current thread.
+    The function runs in `context`, a copy of the context of the caller (e.g. with the current log tag).
+    """
+
+    def _call() -> Any:
+        with LLM_CACHE_SEED_GEN.thread_seed(seed):
+            return f(*args)
+
+    return context.run(_call)
+
+
+def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int, *, io_bound: bool = False) -> list:
     """It will use multiprocessing to call the functions in func_calls with the given parameters.
     The results equals to `return  [f(*args) for f, args in func_calls]`
     It will not call multiprocessing if `n=1`
+    If `io_bound`, the functions are called in `n` threads instead of processes.
 
     NOTE:
     We coooperate with chat_cache_seed feature
@@ -136,21 +168,68 @@ def multiprocessing_wrapper(func_calls: list[tuple[Callable, tuple]], n: int) ->
         the list of functions and their parameters
     n : int
         the number of subprocesses
+    io_bound : bool
+        whether the functions mainly wait for I/O (e.g. LLM calls), then threads are cheaper than processes.
+        Each thread generates its chat cache seeds from its own seed, like a subprocess.
 
     Returns
     -------
     list
 
     """
-    if n == 1:
+    if n <= 1:
         return [f(*args) for f, args in func_calls]
 
-    with mp.Pool(processes=max(1, min(n, len(func_calls)))) as pool:
-        results = [
-            pool.apply_async(_subprocess_wrapper, args=(f, LLM_CACHE_SEED_GEN.get_next_seed(), args))
-            for f, args in func_calls
-        ]
-        return [result.get() for result in results]
+    # Not worth a worker for a single call, and keep the stack traces intact under a debugger
+    call_inline = len(func_calls) <= 1 or sys.gettrace() is not None
+
+    if io_bound:
+        seeds = [LLM_CACHE_SEED_GEN.get_next_seed() for _ in func_calls]
+        # a context can only be entered by one thread at a time, so each call gets its own copy
+        contexts = [contextvars.copy_context() for _ in func_calls]
+        if call_inline:
+            return [
+                _thread_wrapper(f, seed, args, context)
+                for (f, args), seed, context in zip(func_calls, seeds, contexts, strict=True)
+            ]
+        with ThreadPoolExecutor(max_workers=max(1, min(n, len(func_calls)))) as executor:
+            return list(
+                executor.map(
+                    _thread_wrapper,
+                    [f for f, _ in func_calls],
+                    seeds,
+                    [args for _, args in func_calls],
+                    contexts,
+                ),
+            )
+
+    if call_inline:
+        results = []
+        for f, args in func_calls:
+            # like in a subprocess, the call gets its own seed and does not change the random state of this process
+            seed = LLM_CACHE_SEED_GEN.get_next_seed()
+            random_state = random.getstate()
+            try:
+                results.append(_subprocess_wrapper(f, seed, args))
+            finally:
+                random.setstate(random_state)
+        return results
+
+    seeds = [LLM_CACHE_SEED_GEN.get_next_seed() for _ in func_calls]
+    # send the calls in chunks to save round trips between the processes, while keeping the workers balanced
+    chunksize = max(1, len(func_calls) // (n + 2))
+    # The workers are forked for each call, so they see the current state of this process (e.g. the log tag,
+    # the trace path and the settings)
+    with ProcessPoolExecutor(max_workers=max(1, min(n, len(func_calls)))) as pool:
+        return list(
+            pool.map(
+                _subprocess_wrapper,
+                [f for f, _ in func_calls],
+                seeds,
+                [args for _, args in func_calls],
+                chunksize=chunksize,
+            ),
+        )
 
 
 def cache_with_pickle(hash_func: Callable, post_process_func: Callable | None = None) -> Callable:
@@ -1,6 +1,8 @@
 import os
 import sys
+import threading
 from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, timezone
 from functools import partial
 from logging import LogRecord
@@ -53,9 +55,15 @@ class RDAgentLog(SingletonBaseClass):
     #   logger = PipeLog()
     #   logger.info("<code>")
     #   feedback = logger.get_reps()
-    _tag: str = ""
+    # The tag is kept per context, so that the threads (e.g. of `multiprocessing_wrapper`) do not mix their tags up
+    _tag_var: ContextVar[str] = ContextVar("rdagent_log_tag", default="")
+    # The loguru sinks are shared by all the threads; a file sink must only receive the message it is added for
+    _sink_lock = threading.Lock()
 
     def __init__(self, log_trace_path: Union[str, None] = RD_AGENT_SETTINGS.log_trace_path) -> None:
+        if hasattr(self, "storage"):
+            # `RDAgentLog()` returns the shared instance; do not start a new trace folder for it every time
+            return
         if log_trace_path is None:
             timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d_%H-%M-%S-%f")
             self.log_trace_path = Path.cwd() / "log" / timestamp
@@ -72,6 +80,10 @@ class RDAgentLog(SingletonBaseClass):
         self.log_trace_path = Path(log_trace_path)
         self.storage = FileStorage(log_trace_path)
 
+    @property
+    def _tag(self) -> str:
+        return self._tag_var.get()
+
     @contextmanager
     def tag(self, tag: str) -> Generator[None, None, None]:
         if tag.strip() == "":
@@ -79,12 +91,11 @@ class RDAgentLog(SingletonBaseClass):
         if self._tag != "":
             tag = "." + tag
 
-        # TODO: It may result in error in mutithreading or co-routine
-        self._tag = self._tag + tag
+        token = self._tag_var.set(self._tag + tag)
         try:
             yield
         finally:
-            self._tag = self._tag[: -len(tag)]
+            self._tag_var.reset(token)
 
     def get_pids(self) -> str:
         """
@@ -115,32 +126,33 @@ class RDAgentLog(SingletonBaseClass):
 
         logp = self.storage.log(obj, name=tag, save_type="pkl")
 
-        file_handler_id = logger.add(
-            self.log_trace_path / tag.replace(".", "/") / "common_logs.log", format=self.file_format
-        )
-        logger.patch(lambda r: r.update(caller_info)).info(f"Logging object in {Path(logp).absolute()}")
-        logger.remove(file_handler_id)
+        with self._sink_lock:
+            file_handler_id = logger.add(
+                self.log_trace_path / tag.replace(".", "/") / "common_logs.log", format=self.file_format
+            )
+            logger.patch(lambda r: r.update(caller_info)).info(f"Logging object in {Path(logp).absolute()}")
+            logger.remove(file_handler_id)
 
     def info(self, msg: str, *, tag: str = "", raw: bool = False) -> None:
         # TODO: too much duplicated. due to we have no logger with stream context;
         caller_info = get_caller_info()
-        if raw:
-            logger.remove()
-            logger.add(sys.stderr, format=lambda r: "{message}")
-
         tag = f"{self._tag}.{tag}.{self.get_pids()}".strip(".")
         log_file_path = self.log_trace_path / tag.replace(".", "/") / "common_logs.log"
-        if raw:
-            file_handler_id = logger.add(log_file_path, format=partial(self.file_format, raw=True))
-        else:
-            file_handler_id = logger.add(log_file_path, format=self.file_format)
 
-        logger.patch(lambda r: r.update(caller_info)).info(msg)
-        logger.remove(file_handler_id)
+        with self._sink_lock:
+            if raw:
+                logger.remove()
+                logger.add(sys.stderr, format=lambda r: "{message}")
+                file_handler_id = logger.add(log_file_path, format=partial(self.file_format, raw=True))
+            else:
+                file_handler_id = logger.add(log_file_path, format=self.file_format)
 
-        if raw:
-            logger.remove()
-            logger.add(sys.stderr)
+            logger.patch(lambda r: r.update(caller_info)).info(msg)
+            logger.remove(file_handler_id)
+
+            if raw:
+                logger.remove()
+                logger.add(sys.stderr)
 
     def warning(self, msg: str, *, tag: str = "") -> None:
         # TODO: reuse code
@@ -149,18 +161,20 @@ class RDAgentLog(SingletonBaseClass):
         caller_info = get_caller_info()
 
         tag = f"{self._tag}.{tag}.{self.get_pids()}".strip(".")
-        file_handler_id = logger.add(
-            self.log_trace_path / tag.replace(".", "/") / "common_logs.log", format=self.file_format
-        )
-        logger.patch(lambda r: r.update(caller_info)).warning(msg)
-        logger.remove(file_handler_id)
+        with self._sink_lock:
+            file_handler_id = logger.add(
+                self.log_trace_path / tag.replace(".", "/") / "common_logs.log", format=self.file_format
+            )
+            logger.patch(lambda r: r.update(caller_info)).warning(msg)
+            logger.remove(file_handler_id)
 
     def error(self, msg: str, *, tag: str = "") -> None:
         caller_info = get_caller_info()
 
         tag = f"{self._tag}.{tag}.{self.get_pids()}".strip(".")
-        file_handler_id = logger.add(
-            self.log_trace_path / tag.replace(".", "/") / "common_logs.log", format=self.file_format
-        )
-        logger.patch(lambda r: r.update(caller_info)).error(msg)
-        logger.remove(file_handler_id)
+        with self._sink_lock:
+            file_handler_id = logger.add(
+                self.log_trace_path / tag.replace(".", "/") / "common_logs.log", format=self.file_format
+            )
+            logger.patch(lambda r: r.update(caller_info)).error(msg)
+            logger.remove(file_handler_id)
@@ -7,6 +7,7 @@ import random
 import re
 import sqlite3
 import ssl
+import threading
 import time
 import urllib.request
 import uuid
@@ -84,12 +85,20 @@ class ConvManager:
 
 
 class SQliteLazyCache(SingletonBaseClass):
+    # The cache is shared by the threads of one process (e.g. evaluators calling LLM concurrently),
+    # so the connection is created with `check_same_thread=False` and every access is serialized.
+    _lock = threading.RLock()
+
     def __init__(self, cache_location: str) -> None:
         super().__init__()
+        with self._lock:
+            self._connect(cache_location)
+
+    def _connect(self, cache_location: str) -> None:
         self.cache_location = cache_location
         db_file_exist = Path(cache_location).exists()
         # TODO: sqlite3 does not support multiprocessing.
-        self.conn = sqlite3.connect(cache_location, timeout=20)
+        self.conn = sqlite3.connect(cache_location, timeout=20, check_same_thread=False)
         self.c = self.conn.cursor()
         if not db_file_exist:
             self.c.execute(
@@ -119,51 +128,57 @@ class SQliteLazyCache(SingletonBaseClass):
             self.conn.commit()
 
     def chat_get(self, key: str) -> str | None:
-        md5_key = md5_hash(key)
-        self.c.execute("SELECT chat FROM chat_cache WHERE md5_key=?", (md5_key,))
-        result = self.c.fetchone()
-        if result is None:
-            return None
-        return result[0]
+        with self._lock:
+            md5_key = md5_hash(key)
+            self.c.execute("SELECT chat FROM chat_cache WHERE md5_key=?", (md5_key,))
+            result = self.c.fetchone()
+            if result is None:
+                return None
+            return result[0]
 
     def embedding_get(self, key: str) -> list | dict | str | None:
-        md5_key = md5_hash(key)
-        self.c.execute("SELECT embedding FROM embedding_cache WHERE md5_key=?", (md5_key,))
-        result = self.c.fetchone()
-        if result is None:
-            return None
-        return json.loads(result[0])
+        with self._lock:
+            md5_key = md5_hash(key)
+            self.c.execute("SELECT embedding FROM embedding_cache WHERE md5_key=?", (md5_key,))
+            result = self.c.fetchone()
+            if result is None:
+                return None
+            return json.loads(result[0])
 
     def chat_set(self, key: str, value: str) -> None:
-        md5_key = md5_hash(key)
-        self.c.execute(
-            "INSERT OR REPLACE INTO chat_cache (md5_key, chat) VALUES (?, ?)",
-            (md5_key, value),
-        )
-        self.conn.commit()
-
-    def embedding_set(self, content_to_embedding_dict: dict) -> None:
-        for key, value in content_to_embedding_dict.items():
+        with self._lock:
             md5_key = md5_hash(key)
             self.c.execute(
-                "INSERT OR REPLACE INTO embedding_cache (md5_key, embedding) VALUES (?, ?)",
-                (md5_key, json.dumps(value)),
+                "INSERT OR REPLACE INTO chat_cache (md5_key, chat) VALUES (?, ?)",
+                (md5_key, value),
             )
-        self.conn.commit()
+            self.conn.commit()
+
+    def embedding_set(self, content_to_embedding_dict: dict) -> None:
+        with self._lock:
+            for key, value in content_to_embedding_dict.items():
+                md5_key = md5_hash(key)
+                self.c.execute(
+                    "INSERT OR REPLACE INTO embedding_cache (md5_key, embedding) VALUES (?, ?)",
+                    (md5_key, json.dumps(value)),
+                )
+            self.conn.commit()
 
     def message_get(self, conversation_id: str) -> list[str]:
-        self.c.execute("SELECT message FROM message_cache WHERE conversation_id=?", (conversation_id,))
-        result = self.c.fetchone()
-        if result is None:
-            return []
-        return json.loads(result[0])
+        with self._lock:
+            self.c.execute("SELECT message FROM message_cache WHERE conversation_id=?", (conversation_id,))
+            result = self.c.fetchone()
+            if result is None:
+                return []
+            return json.loads(result[0])
 
     def message_set(self, conversation_id: str, message_value: list[str]) -> None:
-        self.c.execute(
-            "INSERT OR REPLACE INTO message_cache (conversation_id, message) VALUES (?, ?)",
-            (conversation_id, json.dumps(message_value)),
-        )
-        self.conn.commit()
+        with self._lock:
+            self.c.execute(
+                "INSERT OR REPLACE INTO message_cache (conversation_id, message) VALUES (?, ?)",
+                (conversation_id, json.dumps(message_value)),
+            )
+            self.conn.commit()
 
 
 class SessionChatHistoryCache(SingletonBaseClass):
@@ -1,4 +1,5 @@
 from copy import deepcopy
+from functools import cached_property
 from pathlib import Path
 
 from rdagent.components.coder.model_coder.model import (
@@ -59,6 +60,11 @@ class QlibModelScenario(Scenario):
         return self._experiment_setting
 
     def get_scenario_all_desc(self, task: Task | None = None) -> str:
+        return self._scenario_all_desc
+
+    @cached_property
+    def _scenario_all_desc(self) -> str:
+        """The description does not depend on the task, so it is built only once"""
         return f"""Background of the scenario:
 {self.background}
 The interface you should follow to write the runnable code:
@@ -7,24 +7,26 @@ Tries to create uniform environment for the agent to run;
 
 # TODO: move the scenario specific docker env into other folders.
 
-import json
+import functools
 import os
 import pickle
 import subprocess
 import sys
+import threading
 import uuid
 import zipfile
 from abc import abstractmethod
+from collections import deque
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Generic, Optional, TypeVar
+from typing import ClassVar, Dict, Generic, Optional, TypeVar
 
 import docker
 import docker.models
 import docker.models.containers
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from pydantic_settings import BaseSettings
 from rich import print
-from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.rule import Rule
 from rich.table import Table
@@ -34,6 +36,20 @@ from rdagent.log import rdagent_logger as logger
 ASpecificBaseModel = TypeVar("ASpecificBaseModel", bound=BaseModel)
 
 
+@functools.lru_cache(maxsize=2048)
+def _resolve(path: str, cwd: str) -> str:
+    return str(Path(cwd, path).resolve())
+
+
+def _abs(path: str) -> str:
+    """
+    The absolute and resolved path.
+    The same workspaces are run again and again, so the results are cached
+    (relative paths are cached together with the working directory).
+    """
+    return _resolve(path, "" if os.path.isabs(path) else os.getcwd())
+
+
 class Env(Generic[ASpecificBaseModel]):
     """
     We use BaseModel as the setting due to the featurs it provides
@@ -89,6 +105,13 @@ class LocalEnv(Env[LocalConf]):
     Sometimes local environment may be more convinient for testing
     """
 
+    max_log_lines: int = 100_000  # the number of the latest output lines kept for each run
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _command(py_bin: str, entry: str) -> tuple[str, ...]:
+        return tuple(str(Path(py_bin).joinpath(entry)).split(" "))
+
     def prepare(self):
         if not (Path("~/.qlib/qlib_data/cn_data").expanduser().resolve().exists()):
             self.run(
@@ -104,17 +127,31 @@ class LocalEnv(Env[LocalConf]):
         if entry is None:
             entry = self.conf.default_entry
 
-        command = str(Path(self.conf.py_bin).joinpath(entry)).split(" ")
-
         cwd = None
         if local_path:
-            cwd = Path(local_path).resolve()
-        result = subprocess.run(command, cwd=cwd, env={**os.environ, **env}, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            raise RuntimeError(f"Error while running the command: {result.stderr}")
-
-        return result.stdout
+            cwd = _abs(local_path)
+        process = subprocess.Popen(
+            list(self._command(self.conf.py_bin, entry)),
+            cwd=cwd,
+            env={**os.environ, **env},
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        # Only the latest lines are kept, so the memory is bounded for the long running commands
+        stdout_lines = deque(maxlen=self.max_log_lines)
+        stderr_lines = deque(maxlen=self.max_log_lines)
+        stderr_thread = threading.Thread(target=stderr_lines.extend, args=(process.stderr,), daemon=True)
+        stderr_thread.start()
+        stdout_lines.extend(process.stdout)
+        stderr_thread.join()
+        returncode = process.wait()
+
+        if returncode != 0:
+            raise RuntimeError(f"Error while running the command: {''.join(stderr_lines)}")
+
+        return "".join(stdout_lines)
 
 
 ## Docker Environment -----
@@ -138,6 +175,19 @@ class DockerConf(BaseSettings):
     enable_gpu: bool = True  # because we will automatically disable GPU if not available. So we enable it by default.
     mem_limit: str | None = "48g"  # Add memory limit attribute
 
+    @field_validator("extra_volumes", mode="after")
+    @classmethod
+    def resolve_extra_volumes(cls, extra_volumes: dict | None) -> dict:
+        """The local paths are resolved once when the config is created instead of in every run"""
+        if extra_volumes is None:
+            return {}
+        return {str(Path(lp).expanduser().resolve()): rp for lp, rp in extra_volumes.items()}
+
+    @cached_property
+    def resolved_extra_volumes(self) -> dict:
+        """The docker volumes of `extra_volumes`"""
+        return {lp: {"bind": rp, "mode": "rw"} for lp, rp in self.extra_volumes.items()}
+
 
 class QlibDockerConf(DockerConf):
     class Config:
@@ -193,33 +243,58 @@ class KGDockerConf(DockerConf):
 class DockerEnv(Env[DockerConf]):
     # TODO: Save the output into a specific file
 
+    # The client and the checked images are shared by all the docker environments in the process
+    _client: ClassVar[docker.DockerClient | None] = None
+    _image_checked: ClassVar[set[str]] = set()
+
+    # The container logs are flushed to the stdout every `log_flush_lines` lines or `log_flush_bytes` characters
+    log_flush_lines: ClassVar[int] = 100
+    log_flush_bytes: ClassVar[int] = 64 * 1024
+
+    @classmethod
+    def _get_client(cls) -> docker.DockerClient:
+        if cls._client is None:
+            cls._client = docker.from_env()
+        return cls._client
+
+    @classmethod
+    @functools.lru_cache
+    def _build_image(cls, dockerfile_folder_path: Path, image: str, network: str | None) -> None:
+        """Build the image from the dockerfile; the same dockerfile and image are built only once per process"""
+        logger.info(f"Building the image from dockerfile: {dockerfile_folder_path}")
+        resp_stream = cls._get_client().api.build(
+            path=str(dockerfile_folder_path),
+            tag=image,
+            network_mode=network,
+            # reuse the layers of the previously built image
+            cache_from=[image],
+            decode=True,
+        )
+        with Progress(SpinnerColumn(), TextColumn("{task.description}")) as p:
+            task = p.add_task("[cyan]Building image...")
+            for status_dict in resp_stream:
+                if "error" in status_dict:
+                    p.update(task, description=f"[red]error: {status_dict['error']}")
+                    raise docker.errors.BuildError(status_dict["error"], "")
+                if "stream" in status_dict:
+                    p.update(task, description=status_dict["stream"])
+        logger.info(f"Finished building the image from dockerfile: {dockerfile_folder_path}")
+
     def prepare(self):
         """
         Download image if it doesn't exist
         """
-        client = docker.from_env()
+        client = self._get_client()
         if self.conf.build_from_dockerfile and self.conf.dockerfile_folder_path.exists():
-            logger.info(f"Building the image from dockerfile: {self.conf.dockerfile_folder_path}")
-            resp_stream = client.api.build(
-                path=str(self.conf.dockerfile_folder_path), tag=self.conf.image, network_mode=self.conf.network
-            )
-            if isinstance(resp_stream, str):
-                logger.info(resp_stream)
-            with Progress(SpinnerColumn(), TextColumn("{task.description}")) as p:
-                task = p.add_task("[cyan]Building image...")
-                for part in resp_stream:
-                    lines = part.decode("utf-8").split("\r\n")
-                    for line in lines:
-                        if line.strip():
-                            status_dict = json.loads(line)
-                            if "error" in status_dict:
-                                p.update(task, description=f"[red]error: {status_dict['error']}")
-                                raise docker.errors.BuildError(status_dict["error"], "")
-                            if "stream" in status_dict:
-                                p.update(task, description=status_dict["stream"])
-            logger.info(f"Finished building the image from dockerfile: {self.conf.dockerfile_folder_path}")
+            self._build_image(self.conf.dockerfile_folder_path, self.conf.image, self.conf.network)
+            # the image exists once it is built
+            self._image_checked.add(self.conf.image)
+            return
+        if self.conf.image in self._image_checked:
+            return
         try:
             client.images.get(self.conf.image)
+            self._image_checked.add(self.conf.image)
         except docker.errors.ImageNotFound:
             image_pull = client.api.pull(self.conf.image, stream=True, decode=True)
             current_status = ""
@@ -252,6 +327,7 @@ class DockerEnv(Env[DockerConf]):
                         description=f"[bright_magenta]layer {layer_id} [yellow]{status}",
                         progress=current_status,
                     )
+            self._image_checked.add(self.conf.image)
         except docker.errors.APIError as e:
             raise RuntimeError(f"Error while pulling the image: {e}")
 
@@ -271,6 +347,27 @@ class DockerEnv(Env[DockerConf]):
             return {}
         return gpu_kwargs
 
+    @staticmethod
+    def _collect_logs(logs, log_lines: list[str]) -> None:
+        """Print the streamed logs of a container and keep the decoded lines in `log_lines`"""
+        # The lines are written in batches, so a chatty container does not cost a write (and a flush) per line
+        out = sys.stdout
+        buffer: list[str] = []
+        buffer_size = 0
+        for log in logs:
+            decoded_log = log.strip().decode("utf-8", errors="replace")
+            log_lines.append(decoded_log)
+            buffer.append(f"{decoded_log}\n")
+            buffer_size += len(decoded_log) + 1
+            if len(buffer) >= DockerEnv.log_flush_lines or buffer_size >= DockerEnv.log_flush_bytes:
+                out.write("".join(buffer))
+                out.flush()
+                buffer.clear()
+                buffer_size = 0
+        if buffer:
+            out.write("".join(buffer))
+            out.flush()
+
     def run(
         self,
         entry: str | None = None,
@@ -280,23 +377,20 @@ class DockerEnv(Env[DockerConf]):
     ) -> str:
         if env is None:
             env = {}
-        client = docker.from_env()
+        client = self._get_client()
         if entry is None:
             entry = self.conf.default_entry
 
         volumns = {}
         if local_path is not None:
+            # not resolved, so a symlinked workspace is mounted by the path it is given as
             local_path = os.path.abspath(local_path)
             volumns[local_path] = {"bind": self.conf.mount_path, "mode": "rw"}
-        if self.conf.extra_volumes is not None:
-            for lp, rp in self.conf.extra_volumes.items():
-                volumns[lp] = {"bind": rp, "mode": "rw"}
+        volumns.update(self.conf.resolved_extra_volumes)
         if running_extra_volume is not None:
             for lp, rp in running_extra_volume.items():
                 volumns[lp] = {"bind": rp, "mode": "rw"}
 
-        log_output = ""
-
         try:
             container: docker.models.containers.Container = client.containers.run(
                 image=self.conf.image,
@@ -311,7 +405,6 @@ class DockerEnv(Env[DockerConf]):
                 mem_limit=self.conf.mem_limit,  # Set memory limit
                 **self._gpu_kwargs(client),
             )
-            logs = container.logs(stream=True)
             print(Rule("[bold green]Docker Logs Begin[/bold green]", style="dark_orange"))
             table = Table(title="Run Info", show_header=False)
             table.add_column("Key", style="bold cyan")
@@ -320,13 +413,16 @@ class DockerEnv(Env[DockerConf]):
             table.add_row("Env", "\n".join(f"{k}:{v}" for k, v in env.items()))
             table.add_row("Volumns", "\n".join(f"{k}:{v}" for k, v in volumns.items()))
             print(table)
-            for log in logs:
-                decoded_log = log.strip().decode()
-                Console().print(decoded_log, markup=False)
-                log_output += decoded_log + "\n"
-            print(Rule("[bold green]Docker Logs End[/bold green]", style="dark_orange"))
+            # The logs are collected aside, so the main thread only waits for the container to exit
+            log_lines = []
+            log_thread = threading.Thread(
+                target=self._collect_logs, args=(container.logs(stream=True, follow=True), log_lines), daemon=True
+            )
+            log_thread.start()
             container.wait()
-            container.stop()
+            log_thread.join()
+            print(Rule("[bold green]Docker Logs End[/bold green]", style="dark_orange"))
+            log_output = "".join(f"{line}\n" for line in log_lines)
             container.remove()
             return log_output
         except docker.errors.ContainerError as e:
@@ -1,8 +1,12 @@
 import os
 import sys
+import tempfile
+import textwrap
 import unittest
 from pathlib import Path
 
+import pytest
+
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 import shutil
 
@@ -71,5 +75,43 @@ class EnvUtils(unittest.TestCase):
         # docker run  --memory=10g  -it --rm local_qlib:latest python -c 'import numpy as np; print(123);  size_mb = 1; size = size_mb * 1024 * 1024 // 8; array = np.random.randn(size).astype(np.float64); array[0], array[-1] = 1.0, 1.0; print(321)'
 
 
+@pytest.mark.offline
+class LocalEnvRunTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        script = """
+            import sys
+
+            n, code = int(sys.argv[1]), int(sys.argv[2])
+            for i in range(n):
+                print(f"out {i}")
+                print(f"err {i}", file=sys.stderr)
+            sys.exit(code)
+        """
+        (Path(self.folder.name) / "emit.py").write_text(textwrap.dedent(script))
+        python = Path(sys.executable)
+        self.env = LocalEnv(conf=LocalConf(py_bin=str(python.parent), default_entry=f"{python.name} emit.py"))
+
+    def _run(self, n: int, code: int) -> str:
+        return self.env.run(entry=f"{self.env.conf.default_entry} {n} {code}", local_path=self.folder.name)
+
+    def test_stdout(self):
+        self.assertEqual(self._run(3, 0), "out 0\nout 1\nout 2\n")
+
+    def test_error(self):
+        with self.assertRaises(RuntimeError) as context:
+            self._run(3, 1)
+        self.assertEqual(str(context.exception), "Error while running the command: err 0\nerr 1\nerr 2\n")
+
+    def test_max_log_lines(self):
+        self.env.max_log_lines = 2
+        # only the latest lines are kept
+        self.assertEqual(self._run(5, 0), "out 3\nout 4\n")
+        with self.assertRaises(RuntimeError) as context:
+            self._run(5, 1)
+        self.assertEqual(str(context.exception), "Error while running the command: err 3\nerr 4\n")
+
+
 if __name__ == "__main__":
     unittest.main()
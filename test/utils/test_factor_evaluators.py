@@ -0,0 +1,206 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rdagent.components.coder.factor_coder.CoSTEER import evaluators
+from rdagent.components.coder.factor_coder.CoSTEER.evaluators import (
+    FactorValueEvaluator,
+    _daily_corr,
+    _remove_warning_lines,
+    shorten_prompt,
+)
+from rdagent.core.utils import LLM_CACHE_SEED_GEN
+from rdagent.log import rdagent_logger as logger
+from rdagent.oai.llm_conf import LLM_SETTINGS
+
+
+def _make_concat_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2020-01-01", periods=20), [f"SH{i:06d}" for i in range(30)]],
+        names=["datetime", "instrument"],
+    )
+    df = pd.DataFrame({"source": rng.normal(size=len(index)), "gt": rng.normal(size=len(index))}, index=index)
+    # tied values, missing values and infinite values
+    df["source"] = df["source"].round(1)
+    df.iloc[::7, 0] = np.nan
+    df.iloc[::11, 1] = np.nan
+    df.iloc[5, 0] = np.inf
+    df.iloc[40, 1] = -np.inf
+    # a constant day and a day without valid pairs
+    df.loc[pd.Timestamp("2020-01-03"), "source"] = 1.0
+    df.loc[pd.Timestamp("2020-01-04"), "gt"] = np.nan
+    return df
+
+
+@pytest.mark.offline
+class DailyCorrTest(unittest.TestCase):
+    def _assert_daily_corr(self, concat_df: pd.DataFrame) -> None:
+        for method in ["pearson", "spearman"]:
+            expected = (
+                concat_df.groupby(level="datetime")
+                .apply(lambda df: df["source"].corr(df["gt"], method=method))
+                .dropna()
+            )
+            result = _daily_corr(concat_df, method=method).dropna()
+            pd.testing.assert_series_equal(result, expected, check_names=False, atol=1e-10)
+
+    def test_daily_corr(self):
+        self._assert_daily_corr(_make_concat_df())
+
+    def test_daily_corr_without_numba(self):
+        with mock.patch.object(evaluators, "njit", None):
+            self._assert_daily_corr(_make_concat_df())
+
+
+class _CharEncoder:
+    """One token per character"""
+
+    def encode_batch(self, texts: list[str], **kwargs) -> list[list[str]]:
+        return [list(text) for text in texts]
+
+    def decode(self, tokens: list[str]) -> str:
+        return "".join(tokens)
+
+
+class _CharBackend:
+    encoder = _CharEncoder()
+
+    def build_messages_and_calculate_token(self, user_prompt: str, system_prompt: str | None) -> int:
+        return len(user_prompt) + len(system_prompt or "")
+
+
+@pytest.mark.offline
+class ShortenPromptTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(evaluators, "_get_backend", return_value=_CharBackend()),
+            mock.patch.object(LLM_SETTINGS, "chat_token_limit", 400),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_short_prompt_is_unchanged(self):
+        prompt = shorten_prompt("A{{ a }}B", {"a": "x" * 100}, "a")
+        self.assertEqual(prompt, "A" + "x" * 100 + "B")
+
+    def test_shared_cap(self):
+        render_kwargs = {"a": "a" * 400 + "x" * 100, "b": "y" * 50, "c": "c" * 200 + "z" * 100}
+        prompt = shorten_prompt("A{{ a }}B{{ b }}C{{ c }}", render_kwargs, ["a", "b", "c"], max_trail=10)
+        self.assertLessEqual(len(prompt), 400 - 10)
+        head_a, rest = prompt[1:].split("B", 1)
+        kept_b, kept_c = rest.split("C", 1)
+        # the short value is kept as it is, the long ones keep the same number of tokens from their tails
+        self.assertEqual(kept_b, render_kwargs["b"])
+        self.assertEqual(len(head_a), len(kept_c))
+        self.assertTrue(render_kwargs["a"].endswith(head_a) and render_kwargs["c"].endswith(kept_c))
+        # the cap is the largest one that fits: one more token for each long value would exceed the budget
+        self.assertGreater(len(prompt) + 2, 400 - 10)
+
+
+@pytest.mark.offline
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "\n",
+        "no warnings here",
+        "a\nUserWarning: x\nb",
+        "Warning: first\nb",
+        "a\nb\nFutureWarning: last",
+        "a\nFutureWarning: last\n",
+        "a\nb\n",
+        "warning\nWARNING\nwarning",
+        "a\n\nwarning\n\nb",
+        "a\r\nUserWarning: x\r\nb\r\n",
+        "a\r\nb\r\nwarning\r\n",
+    ],
+)
+def test_remove_warning_lines(text):
+    expected = "\n".join(line for line in text.split("\n") if "warning" not in line.lower())
+    assert _remove_warning_lines(text) == expected
+
+
+class _FakeWorkspace:
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df
+        self.execute_count = 0
+
+    def execute(self):
+        self.execute_count += 1
+        return "Execution succeeded.", self.df
+
+
+def _make_factor_df(values: np.ndarray) -> pd.DataFrame:
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2020-01-01", periods=10), [f"SH{i:06d}" for i in range(20)]],
+        names=["datetime", "instrument"],
+    )
+    return pd.DataFrame({"factor": values}, index=index)
+
+
+@pytest.mark.offline
+class FactorValueEvaluatorTest(unittest.TestCase):
+    def setUp(self):
+        self.output_format_calls = []
+
+        def evaluate_output_format(implementation, gt_implementation, **kwargs):
+            self.output_format_calls.append((LLM_CACHE_SEED_GEN.get_next_seed(), logger._tag))
+            return "The output format is correct.", True
+
+        # the output format check is the only one which calls the LLM
+        patch = mock.patch.object(evaluators, "FactorOutputFormatEvaluator")
+        patch.start().return_value.evaluate.side_effect = evaluate_output_format
+        self.addCleanup(patch.stop)
+
+    def _evaluate(self, gen_values: np.ndarray, gt_values: np.ndarray):
+        gen, gt = _FakeWorkspace(_make_factor_df(gen_values)), _FakeWorkspace(_make_factor_df(gt_values))
+        conclusion, decision = FactorValueEvaluator(None).evaluate(gen, gt)
+        # the dataframes are shared by all the checks
+        self.assertEqual((gen.execute_count, gt.execute_count), (1, 1))
+        return conclusion.split("\n"), decision
+
+    def test_equal_values(self):
+        values = np.random.default_rng(0).normal(size=200)
+        conclusions, decision = self._evaluate(values, values.copy())
+        self.assertTrue(decision)
+        # the output format feedback keeps its place although it is computed aside
+        self.assertEqual(
+            conclusions[:4],
+            [
+                "The source dataframe has only one column which is correct.",
+                "The source dataframe does not have any infinite values.",
+                "The output format is correct.",
+                "The generated dataframe is daily.",
+            ],
+        )
+        self.assertEqual(conclusions[-2], "All values in the dataframes are equal within the tolerance of 1e-6.")
+        self.assertTrue(conclusions[-1].startswith("The dataframes are highly correlated."))
+
+    def test_infinite_values(self):
+        rng = np.random.default_rng(0)
+        gen_values = rng.normal(size=200)
+        gen_values[3] = np.inf
+        conclusions, decision = self._evaluate(gen_values, rng.normal(size=200))
+        self.assertIs(decision, False)
+        self.assertEqual(conclusions[1], "The source dataframe has 1 infinite values. Please check the implementation.")
+        self.assertEqual(conclusions[2], "The output format is correct.")
+
+    def test_output_format_seed(self):
+        values = np.arange(200, dtype=float)
+        for _ in range(2):
+            LLM_CACHE_SEED_GEN.set_seed(7)
+            with logger.tag("value"):
+                self._evaluate(values, values.copy())
+        # the worker thread gets its seed from the caller and logs under the tag of the caller
+        self.assertEqual(len(self.output_format_calls), 2)
+        self.assertEqual(self.output_format_calls[0], self.output_format_calls[1])
+        self.assertEqual(self.output_format_calls[0][1], "value")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,28 @@
+import time
 import unittest
 
 import pytest
 
-from rdagent.core.utils import SingletonBaseClass
+from rdagent.core.utils import (
+    LLM_CACHE_SEED_GEN,
+    SingletonBaseClass,
+    multiprocessing_wrapper,
+)
+from rdagent.log import rdagent_logger as logger
+
+
+def _next_seeds(n: int) -> list[int]:
+    return [LLM_CACHE_SEED_GEN.get_next_seed() for _ in range(n)]
+
+
+def _nested_seeds(n: int) -> list[list[int]]:
+    return multiprocessing_wrapper([(_next_seeds, (n,)) for _ in range(2)], n=2, io_bound=True)
+
+
+def _tagged(tag: str) -> str:
+    with logger.tag(tag):
+        time.sleep(0.01)  # let the threads overlap
+        return logger._tag
 
 
 class A(SingletonBaseClass):
@@ -69,6 +89,24 @@ class MiscTest(unittest.TestCase):
         # print(id(a3), id(a3_pkl))  # not the same object
         # print(a1.kwargs)  # a1 will be changed.
 
+    def test_thread_seeds(self):
+        def run():
+            LLM_CACHE_SEED_GEN.set_seed(7)
+            seeds = multiprocessing_wrapper([(_next_seeds, (3,)) for _ in range(8)], n=4, io_bound=True)
+            # the threads started inside a thread get their seeds from it
+            nested_seeds = multiprocessing_wrapper([(_nested_seeds, (3,)) for _ in range(4)], n=4, io_bound=True)
+            return seeds, nested_seeds, LLM_CACHE_SEED_GEN.get_next_seed()
+
+        # every call gets its own seed, so the seeds do not depend on how the threads are scheduled
+        self.assertEqual(run(), run())
+
+    def test_thread_log_tag(self):
+        with logger.tag("evaluate"):
+            tags = multiprocessing_wrapper([(_tagged, (str(i),)) for i in range(8)], n=4, io_bound=True)
+            self.assertEqual(logger._tag, "evaluate")
+        # the threads start from the tag of the caller and do not see the tags of each other
+        self.assertEqual(tags, [f"evaluate.{i}" for i in range(8)])
+
 
 if __name__ == "__main__":
     unittest.main()